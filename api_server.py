@@ -1,16 +1,26 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Optional
+from dataclasses import dataclass
+import io
+import logging
 import os
-import sys
+import bisect
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import quote
 import numpy as np
-from model import MyopiaPredictionModel
+import uvicorn
+from model import FEATURE_COLUMNS, MyopiaPredictionModel
 from report_generator import MyopiaReportGenerator
-import tempfile
 
-app = FastAPI(title="Stellest AI API", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Stellest AI API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Enable CORS for Next.js frontend
 # In production, add your Vercel domain to allow_origins
@@ -33,352 +43,405 @@ app.add_middleware(
 
 # Initialize model and report generator
 model = None
+_model_lock = threading.Lock()
 report_generator = MyopiaReportGenerator()
 
+# Model input dtype; the tree models are trained on float32 features
+_FEATURE_DTYPE = np.float32
+
+# Risk factor templates: (factor, score, description) per level, indexed
+# Low / Medium / High by _score_factors (Outdoor Time has no Medium level)
+_IMPACTS = ("Low", "Medium", "High")
+_RISK_FACTOR_TEMPLATES = (
+    (("Age", 0, "Age {} years - lower risk"),
+     ("Age", 1, "Age {} years - moderate risk"),
+     ("Young Age", 2, "Age {} years - highest risk age group")),
+    (("Genetics", 0, "No parental myopia - lower genetic risk"),
+     ("Genetics", 1, "One parent myopic - moderate genetic risk"),
+     ("Genetics", 2, "Both parents myopic - strong genetic predisposition")),
+    (("Myopia Severity", 0, "Mild myopia ({:.2f} D)"),
+     ("Myopia Severity", 1, "Moderate myopia ({:.2f} D)"),
+     ("Myopia Severity", 2, "High myopia ({:.2f} D)")),
+    (("Axial Length", 0, "Normal range ({:.2f} mm)"),
+     ("Axial Length", 1, "Approaching limit ({:.2f} mm)"),
+     ("Axial Length", 2, "Elongated ({:.2f} mm > 24.5mm)")),
+    (("Screen Time", 0, "Acceptable ({} hrs/day)"),
+     ("Screen Time", 0.5, "Moderate ({} hrs/day)"),
+     ("Screen Time", 1, "Excessive ({} hrs/day > 4hrs)")),
+    (("Outdoor Time", 0, "Adequate ({} hrs/day)"),
+     None,
+     ("Outdoor Time", 1, "Insufficient ({} hrs/day < 2hrs)")),
+    (("Treatment Compliance", 0, "Excellent ({:.0f}%)"),
+     ("Treatment Compliance", 0.5, "Good but could improve ({:.0f}%)"),
+     ("Treatment Compliance", 1, "Poor ({:.0f}% < 75%)")),
+)
+
+# Level thresholds; values above a bound are riskier except for age and
+# compliance, where values below the bound are riskier
+_AGE_RISK_BOUNDS = (10, 12)
+_SEVERITY_BOUNDS = (1.5, 3)
+_AXIAL_LENGTH_BOUNDS = (24.0, 24.5)
+_SCREEN_BOUNDS = (3, 4)
+_COMPLIANCE_BOUNDS = (0.75, 0.9)
+
+def _score_factors(age, myopic_parents_encoded, myopia_severity, avg_axial_length, screen_hours, outdoor_hours, compliance_score):
+    """Bucket each risk factor into a level (0 = Low, 1 = Medium, 2 = High)"""
+    return (
+        2 - bisect.bisect_right(_AGE_RISK_BOUNDS, age),
+        myopic_parents_encoded,
+        bisect.bisect_left(_SEVERITY_BOUNDS, myopia_severity),
+        bisect.bisect_left(_AXIAL_LENGTH_BOUNDS, avg_axial_length),
+        bisect.bisect_left(_SCREEN_BOUNDS, screen_hours),
+        2 if outdoor_hours < 2 else 0,
+        2 - bisect.bisect_right(_COMPLIANCE_BOUNDS, compliance_score),
+    )
+
 def _calculate_risk_factors(patient_data, avg_spherical, myopia_severity, avg_axial_length, compliance_score, myopic_parents_encoded):
     """Calculate risk factor contributions"""
-    factors = []
-    
-    # Age risk
-    if patient_data.age < 10:
-        factors.append({"factor": "Young Age", "score": 2, "impact": "High", "description": f"Age {patient_data.age} years - highest risk age group"})
-    elif patient_data.age < 12:
-        factors.append({"factor": "Age", "score": 1, "impact": "Medium", "description": f"Age {patient_data.age} years - moderate risk"})
-    else:
-        factors.append({"factor": "Age", "score": 0, "impact": "Low", "description": f"Age {patient_data.age} years - lower risk"})
-    
-    # Genetic risk
-    if myopic_parents_encoded == 2:
-        factors.append({"factor": "Genetics", "score": 2, "impact": "High", "description": "Both parents myopic - strong genetic predisposition"})
-    elif myopic_parents_encoded == 1:
-        factors.append({"factor": "Genetics", "score": 1, "impact": "Medium", "description": "One parent myopic - moderate genetic risk"})
-    else:
-        factors.append({"factor": "Genetics", "score": 0, "impact": "Low", "description": "No parental myopia - lower genetic risk"})
-    
-    # Myopia severity
-    if myopia_severity > 3:
-        factors.append({"factor": "Myopia Severity", "score": 2, "impact": "High", "description": f"High myopia ({myopia_severity:.2f} D)"})
-    elif myopia_severity > 1.5:
-        factors.append({"factor": "Myopia Severity", "score": 1, "impact": "Medium", "description": f"Moderate myopia ({myopia_severity:.2f} D)"})
-    else:
-        factors.append({"factor": "Myopia Severity", "score": 0, "impact": "Low", "description": f"Mild myopia ({myopia_severity:.2f} D)"})
-    
-    # Axial length
-    if avg_axial_length > 24.5:
-        factors.append({"factor": "Axial Length", "score": 2, "impact": "High", "description": f"Elongated ({avg_axial_length:.2f} mm > 24.5mm)"})
-    elif avg_axial_length > 24.0:
-        factors.append({"factor": "Axial Length", "score": 1, "impact": "Medium", "description": f"Approaching limit ({avg_axial_length:.2f} mm)"})
-    else:
-        factors.append({"factor": "Axial Length", "score": 0, "impact": "Low", "description": f"Normal range ({avg_axial_length:.2f} mm)"})
-    
-    # Lifestyle factors
-    if patient_data.screen_hours > 4:
-        factors.append({"factor": "Screen Time", "score": 1, "impact": "High", "description": f"Excessive ({patient_data.screen_hours} hrs/day > 4hrs)"})
-    elif patient_data.screen_hours > 3:
-        factors.append({"factor": "Screen Time", "score": 0.5, "impact": "Medium", "description": f"Moderate ({patient_data.screen_hours} hrs/day)"})
-    else:
-        factors.append({"factor": "Screen Time", "score": 0, "impact": "Low", "description": f"Acceptable ({patient_data.screen_hours} hrs/day)"})
-    
-    if patient_data.outdoor_hours < 2:
-        factors.append({"factor": "Outdoor Time", "score": 1, "impact": "High", "description": f"Insufficient ({patient_data.outdoor_hours} hrs/day < 2hrs)"})
-    else:
-        factors.append({"factor": "Outdoor Time", "score": 0, "impact": "Low", "description": f"Adequate ({patient_data.outdoor_hours} hrs/day)"})
+    levels = _score_factors(
+        patient_data.age, myopic_parents_encoded, myopia_severity, avg_axial_length,
+        patient_data.screen_hours, patient_data.outdoor_hours, compliance_score
+    )
+    # Value substituted into each factor's description
+    values = (
+        patient_data.age, None, myopia_severity, avg_axial_length,
+        patient_data.screen_hours, patient_data.outdoor_hours, compliance_score * 100
+    )
     
-    # Compliance
-    if compliance_score < 0.75:
-        factors.append({"factor": "Treatment Compliance", "score": 1, "impact": "High", "description": f"Poor ({compliance_score*100:.0f}% < 75%)"})
-    elif compliance_score < 0.9:
-        factors.append({"factor": "Treatment Compliance", "score": 0.5, "impact": "Medium", "description": f"Good but could improve ({compliance_score*100:.0f}%)"})
-    else:
-        factors.append({"factor": "Treatment Compliance", "score": 0, "impact": "Low", "description": f"Excellent ({compliance_score*100:.0f}%)"})
+    factors = [None] * len(_RISK_FACTOR_TEMPLATES)
+    total_score = 0
+    for i, (templates, level, value) in enumerate(zip(_RISK_FACTOR_TEMPLATES, levels, values)):
+        factor, score, description = templates[level]
+        factors[i] = {"factor": factor, "score": score, "impact": _IMPACTS[level], "description": description.format(value)}
+        total_score += score
     
-    total_score = sum(f['score'] for f in factors)
     return {
         "factors": factors,
         "total_score": float(total_score),
         "max_possible_score": 10.0,
-        "risk_percentage": float((total_score / 10.0) * 100)
+        "risk_percentage": (total_score / 10.0) * 100
     }
 
+# Projection horizons (years from now)
+_TIMELINE_YEARS = (1, 2, 3, 5)
+_YEARS = np.array(_TIMELINE_YEARS, dtype=np.float64)
+
 def _calculate_progression_timeline(annual_progression, current_age, current_severity):
     """Calculate projected progression over time"""
-    timeline = []
-    years = [1, 2, 3, 5]
-    current_severity_float = float(current_severity)
+    current_severity = float(current_severity)
+    with_treatment = current_severity + annual_progression * _YEARS
     
-    for year in years:
-        projected_severity = current_severity_float + (annual_progression * year)
-        projected_age = current_age + year
-        
-        # Calculate expected progression without treatment
-        without_treatment_rate = annual_progression / 0.4  # Reverse Stellest effect
-        projected_without = current_severity_float + (without_treatment_rate * year)
-        
-        timeline.append({
-            "year": year,
-            "projected_age": float(round(projected_age, 1)),
-            "severity_with_treatment": float(round(projected_severity, 2)),
-            "severity_without_treatment": float(round(projected_without, 2)),
-            "saved_diopters": float(round(projected_without - projected_severity, 2))
-        })
+    # Calculate expected progression without treatment
+    without_treatment_rate = annual_progression / 0.4  # Reverse Stellest effect
+    without_treatment = current_severity + without_treatment_rate * _YEARS
     
-    return timeline
+    projected_ages = (current_age + _YEARS).tolist()
+    saved = (without_treatment - with_treatment).tolist()
+    
+    # Python's round() (not np.round) so half-way values round exactly as before
+    return [
+        {
+            "year": year,
+            "projected_age": round(projected_age, 1),
+            "severity_with_treatment": round(severity_with, 2),
+            "severity_without_treatment": round(severity_without, 2),
+            "saved_diopters": round(saved_diopters, 2)
+        }
+        for year, projected_age, severity_with, severity_without, saved_diopters
+        in zip(_TIMELINE_YEARS, projected_ages, with_treatment.tolist(), without_treatment.tolist(), saved)
+    ]
+
+# Population average severity by age group (from clinical literature); an age
+# falls in group i when it is below _AGE_BOUNDS[i]
+_AGE_BOUNDS = (10, 12, 14)
+_AGE_LABELS = ("8-10", "10-12", "12-14", "14+")
+_AGE_SEVERITY = (1.5, 2.5, 3.2, 3.8)
 
 def _calculate_comparative_stats(patient_data, myopia_severity, avg_axial_length):
     """Calculate comparative statistics vs population norms"""
-    # Population averages (from clinical literature)
-    avg_age_severity = {
-        "8-10": 1.5,
-        "10-12": 2.5,
-        "12-14": 3.2,
-        "14+": 3.8
-    }
-    
-    age_group = "8-10" if patient_data.age < 10 else "10-12" if patient_data.age < 12 else "12-14" if patient_data.age < 14 else "14+"
-    population_avg_severity = avg_age_severity.get(age_group, 2.5)
+    age_index = bisect.bisect_right(_AGE_BOUNDS, patient_data.age)
+    age_group = _AGE_LABELS[age_index]
+    population_avg_severity = _AGE_SEVERITY[age_index]
     
     # Normal axial length for age (mm)
     normal_axial_length = 22.0 + (patient_data.age * 0.15)  # Rough estimate
     
     return {
         "age_group": age_group,
-        "population_avg_severity": float(population_avg_severity),
-        "patient_severity": float(myopia_severity),
-        "severity_difference": float(round(myopia_severity - population_avg_severity, 2)),
-        "severity_percentile": float(round((myopia_severity / (population_avg_severity * 2)) * 100, 1)) if population_avg_severity > 0 else 50,
-        "normal_axial_length": float(round(normal_axial_length, 2)),
-        "patient_axial_length": float(round(avg_axial_length, 2)),
-        "axial_length_difference": float(round(avg_axial_length - normal_axial_length, 2)),
+        "population_avg_severity": population_avg_severity,
+        "patient_severity": myopia_severity,
+        "severity_difference": round(myopia_severity - population_avg_severity, 2),
+        "severity_percentile": round((myopia_severity / (population_avg_severity * 2)) * 100, 1) if population_avg_severity > 0 else 50,
+        "normal_axial_length": round(normal_axial_length, 2),
+        "patient_axial_length": round(avg_axial_length, 2),
+        "axial_length_difference": round(avg_axial_length - normal_axial_length, 2),
         "comparison": "Above Average" if myopia_severity > population_avg_severity else "Below Average"
     }
 
+# Request encodings (match the training data encoding in model.py)
+_PARENTS_ENC = {"None": 0, "One": 1, "Both": 2}
+_MALE_GENDERS = frozenset(("M", "MALE"))
+
+@dataclass
+class Derived:
+    """Values derived from a PatientData request, shared by both endpoints"""
+    features: np.ndarray
+    myopic_parents_encoded: int
+    avg_spherical: float
+    myopia_severity: float
+    avg_axial_length: float
+    years_since_diagnosis: float
+    screen_outdoor_ratio: float
+    compliance_score: float
+    has_astigmatism: int
+
+def _preprocess(patient_data):
+    """Derive model inputs once and build the feature row in FEATURE_COLUMNS order"""
+    myopic_parents_encoded = _PARENTS_ENC.get(patient_data.myopic_parents, 0)
+    avg_spherical = (patient_data.re_spherical + patient_data.le_spherical) / 2
+    myopia_severity = abs(avg_spherical)
+    avg_axial_length = (patient_data.re_axial_length + patient_data.le_axial_length) / 2
+    years_since_diagnosis = patient_data.age - patient_data.age_diagnosis
+    screen_outdoor_ratio = patient_data.screen_hours / (patient_data.outdoor_hours + 0.1)
+    compliance_score = min(max(patient_data.wearing_hours / 12, 0.0), 1.0)
+    has_astigmatism = 1 if (patient_data.re_cylinder != 0 or patient_data.le_cylinder != 0) else 0
+    
+    row = np.empty((1, len(FEATURE_COLUMNS)), dtype=_FEATURE_DTYPE)
+    row[0, 0] = patient_data.age
+    row[0, 1] = patient_data.age_diagnosis
+    row[0, 2] = years_since_diagnosis
+    row[0, 3] = 1 if patient_data.gender.upper() in _MALE_GENDERS else 0
+    row[0, 4] = myopic_parents_encoded
+    row[0, 5] = patient_data.outdoor_hours
+    row[0, 6] = patient_data.screen_hours
+    row[0, 7] = screen_outdoor_ratio
+    row[0, 8] = 1 if patient_data.had_myopia_control else 0
+    row[0, 9] = myopia_severity
+    row[0, 10] = has_astigmatism
+    row[0, 11] = avg_axial_length
+    row[0, 12] = 1 if avg_axial_length > 24.5 else 0
+    row[0, 13] = patient_data.wearing_hours
+    row[0, 14] = compliance_score
+    
+    return Derived(
+        features=row,
+        myopic_parents_encoded=myopic_parents_encoded,
+        avg_spherical=avg_spherical,
+        myopia_severity=myopia_severity,
+        avg_axial_length=avg_axial_length,
+        years_since_diagnosis=years_since_diagnosis,
+        screen_outdoor_ratio=screen_outdoor_ratio,
+        compliance_score=compliance_score,
+        has_astigmatism=has_astigmatism
+    )
+
+@lru_cache(maxsize=1024)
+def _cached_predict(features_key):
+    """Model prediction memoized on the feature tuple (callers must not mutate the result)"""
+    return (model or load_model()).predict(features_key)
+
+def _prepare_request(patient_data):
+    """Run the model and all analyses for a request"""
+    derived = _preprocess(patient_data)
+    
+    # Make prediction (identical resubmissions are served from the cache)
+    prediction = _cached_predict(tuple(derived.features[0].tolist()))
+    
+    # Calculate additional analyses
+    risk_factors = _calculate_risk_factors(patient_data, derived.avg_spherical, derived.myopia_severity, derived.avg_axial_length, derived.compliance_score, derived.myopic_parents_encoded)
+    progression_timeline = _calculate_progression_timeline(prediction['estimated_progression'], patient_data.age, derived.myopia_severity)
+    comparative_stats = _calculate_comparative_stats(patient_data, derived.myopia_severity, derived.avg_axial_length)
+    
+    # Prepare patient info for report
+    patient_info = {
+        'name': patient_data.name or "Patient",
+        'age': patient_data.age,
+        'gender': patient_data.gender,
+        'date': None,
+        'age_diagnosis': patient_data.age_diagnosis,
+        'myopic_parents': derived.myopic_parents_encoded,
+        'outdoor_hours': patient_data.outdoor_hours,
+        'screen_hours': patient_data.screen_hours,
+        're_spherical': patient_data.re_spherical,
+        're_cylinder': patient_data.re_cylinder,
+        'le_spherical': patient_data.le_spherical,
+        'le_cylinder': patient_data.le_cylinder,
+        're_axial_length': patient_data.re_axial_length,
+        'le_axial_length': patient_data.le_axial_length,
+        'avg_axial_length': derived.avg_axial_length,
+        'myopia_severity': derived.myopia_severity,
+        'wearing_hours': patient_data.wearing_hours,
+        'compliance_score': derived.compliance_score,
+        'qol_score': patient_data.qol_score or 3,
+        'years_since_diagnosis': derived.years_since_diagnosis,
+        'screen_outdoor_ratio': derived.screen_outdoor_ratio,
+        'has_astigmatism': derived.has_astigmatism
+    }
+    
+    return {
+        "prediction": prediction,
+        "patient_info": patient_info,
+        "risk_factors": risk_factors,
+        "progression_timeline": progression_timeline,
+        "comparative_stats": comparative_stats
+    }
+
+# Prepared results per request body, so the usual preview-then-download flow
+# (predict, then generate-report on the same input) is computed once
+_PREDICT_CACHE = {}
+_PREDICT_CACHE_TTL = 300  # seconds
+_PREDICT_CACHE_MAX = 1024
+_predict_cache_lock = threading.Lock()
+
+def _prepare_request_cached(patient_data):
+    """_prepare_request with a short-lived cache keyed by the (frozen, hashable) request"""
+    now = time.monotonic()
+    with _predict_cache_lock:
+        entry = _PREDICT_CACHE.get(patient_data)
+    if entry is not None and now - entry[1] < _PREDICT_CACHE_TTL:
+        return entry[0]
+    
+    result = _prepare_request(patient_data)
+    with _predict_cache_lock:
+        if len(_PREDICT_CACHE) >= _PREDICT_CACHE_MAX:
+            # Drop expired entries; if still full, drop the oldest (dicts keep insertion order)
+            for key in [k for k, (_, stored_at) in _PREDICT_CACHE.items() if now - stored_at >= _PREDICT_CACHE_TTL]:
+                del _PREDICT_CACHE[key]
+            if len(_PREDICT_CACHE) >= _PREDICT_CACHE_MAX:
+                del _PREDICT_CACHE[next(iter(_PREDICT_CACHE))]
+        _PREDICT_CACHE[patient_data] = (result, now)
+    return result
+
+_MODEL_PATH = os.path.join(os.path.dirname(__file__), "stellest_model.pkl")
+
 def load_model():
     global model
-    if model is None:
-        model = MyopiaPredictionModel()
-        # Try to load existing model, if not found, train new one
-        excel_path = os.path.join(os.path.dirname(__file__), "Stellest_Restrospective Data to Hindustan.xlsx")
-        model_path = os.path.join(os.path.dirname(__file__), "stellest_model.pkl")
-        
-        if os.path.exists(model_path):
-            try:
-                model.load_model(model_path)
-                print("✓ Loaded existing model")
-            except:
-                print("Training new model...")
-                df = model.load_and_preprocess_data(excel_path)
-                model.train_models(df)
-                model.save_model(model_path)
-        else:
-            print("Training new model...")
-            df = model.load_and_preprocess_data(excel_path)
-            model.train_models(df)
-            model.save_model(model_path)
+    if model is not None:
+        return model
+    with _model_lock:
+        if model is None:
+            instance = MyopiaPredictionModel()
+            # Try to load existing model, if not found, train new one
+            excel_path = os.path.join(os.path.dirname(__file__), "Stellest_Restrospective Data to Hindustan.xlsx")
+            if os.path.exists(_MODEL_PATH):
+                try:
+                    instance.load_model(_MODEL_PATH)
+                    logger.info("Loaded existing model from %s", _MODEL_PATH)
+                except:
+                    logger.warning("Could not load %s, training new model...", _MODEL_PATH, exc_info=True)
+                    df = instance.load_and_preprocess_data(excel_path)
+                    instance.train_models(df)
+                    instance.save_model(_MODEL_PATH)
+            else:
+                logger.info("No saved model found, training new model...")
+                df = instance.load_and_preprocess_data(excel_path)
+                instance.train_models(df)
+                instance.save_model(_MODEL_PATH)
+            model = instance
     return model
 
+@app.on_event("startup")
+async def _startup():
+    """Load (or train) the model once at boot instead of on the first request"""
+    load_model()
+
+# Reusable field constraints (checked by pydantic-core during validation)
+Age = Annotated[float, Field(ge=0, le=120)]
+DailyHours = Annotated[float, Field(ge=0, le=24)]
+AxialLength = Annotated[float, Field(gt=0, le=40)]
+
 class PatientData(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='ignore', str_strip_whitespace=True)
+    
     name: Optional[str] = "Patient"
-    age: float
+    age: Age
     gender: str  # "M" or "F"
-    age_diagnosis: float
+    age_diagnosis: Age
     myopic_parents: str  # "None", "One", "Both"
-    outdoor_hours: float
-    screen_hours: float
+    outdoor_hours: DailyHours
+    screen_hours: DailyHours
     had_myopia_control: bool = False
     re_spherical: float
     re_cylinder: float
     le_spherical: float
     le_cylinder: float
-    re_axial_length: float
-    le_axial_length: float
-    wearing_hours: float
-    qol_score: Optional[float] = None
+    re_axial_length: AxialLength
+    le_axial_length: AxialLength
+    wearing_hours: DailyHours
+    qol_score: Optional[Annotated[float, Field(ge=0, le=5)]] = None  # 0 or missing means not assessed
 
 @app.get("/")
 def read_root():
     return {"message": "Stellest AI API is running"}
 
+# Plain def: FastAPI runs it in its threadpool, so model inference never blocks the event loop
 @app.post("/api/predict")
-async def predict(patient_data: PatientData):
+def predict(patient_data: PatientData):
     try:
-        model_instance = load_model()
-        
-        # Convert patient data to model input format
-        myopic_parents_encoded = {"None": 0, "One": 1, "Both": 2}.get(patient_data.myopic_parents, 0)
-        gender_encoded = 1 if patient_data.gender.upper() in ["M", "MALE"] else 0
-        
-        avg_spherical = (patient_data.re_spherical + patient_data.le_spherical) / 2
-        myopia_severity = abs(avg_spherical)
-        avg_axial_length = (patient_data.re_axial_length + patient_data.le_axial_length) / 2
-        years_since_diagnosis = patient_data.age - patient_data.age_diagnosis
-        screen_outdoor_ratio = patient_data.screen_hours / (patient_data.outdoor_hours + 0.1)
-        compliance_score = float(np.clip(patient_data.wearing_hours / 12, 0, 1))
-        has_astigmatism = 1 if (patient_data.re_cylinder != 0 or patient_data.le_cylinder != 0) else 0
-        axial_length_abnormal = 1 if avg_axial_length > 24.5 else 0
-        
-        # Prepare feature vector in the same order as training
-        features = [
-            patient_data.age,
-            patient_data.age_diagnosis,
-            years_since_diagnosis,
-            gender_encoded,
-            myopic_parents_encoded,
-            patient_data.outdoor_hours,
-            patient_data.screen_hours,
-            screen_outdoor_ratio,
-            1 if patient_data.had_myopia_control else 0,
-            myopia_severity,
-            has_astigmatism,
-            avg_axial_length,
-            axial_length_abnormal,
-            patient_data.wearing_hours,
-            compliance_score
-        ]
-        
-        # Make prediction
-        try:
-            prediction = model_instance.predict(features)
-        except Exception as pred_error:
-            print(f"Model prediction error: {str(pred_error)}")
-            import traceback
-            print(traceback.format_exc())
-            raise
-        
-        # Calculate additional analyses
-        risk_factors = _calculate_risk_factors(patient_data, avg_spherical, myopia_severity, avg_axial_length, compliance_score, myopic_parents_encoded)
-        progression_timeline = _calculate_progression_timeline(prediction['estimated_progression'], patient_data.age, myopia_severity)
-        comparative_stats = _calculate_comparative_stats(patient_data, myopia_severity, avg_axial_length)
-        
-        # Prepare patient info for report
-        patient_info = {
-            'name': patient_data.name,
-            'age': patient_data.age,
-            'gender': patient_data.gender,
-            'date': None,
-            'age_diagnosis': patient_data.age_diagnosis,
-            'myopic_parents': myopic_parents_encoded,
-            'outdoor_hours': patient_data.outdoor_hours,
-            'screen_hours': patient_data.screen_hours,
-            're_spherical': patient_data.re_spherical,
-            're_cylinder': patient_data.re_cylinder,
-            'le_spherical': patient_data.le_spherical,
-            'le_cylinder': patient_data.le_cylinder,
-            're_axial_length': patient_data.re_axial_length,
-            'le_axial_length': patient_data.le_axial_length,
-            'avg_axial_length': avg_axial_length,
-            'myopia_severity': myopia_severity,
-            'wearing_hours': patient_data.wearing_hours,
-            'compliance_score': compliance_score,
-            'qol_score': patient_data.qol_score or 3,
-            'years_since_diagnosis': years_since_diagnosis,
-            'screen_outdoor_ratio': screen_outdoor_ratio,
-            'has_astigmatism': has_astigmatism
-        }
-        
-        return {
-            "prediction": prediction,
-            "patient_info": patient_info,
-            "risk_factors": risk_factors,
-            "progression_timeline": progression_timeline,
-            "comparative_stats": comparative_stats
-        }
+        return _prepare_request_cached(patient_data)
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Prediction error: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        logger.exception("Prediction error")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 @app.post("/api/generate-report")
 async def generate_report(patient_data: PatientData):
     try:
-        model_instance = load_model()
-        
-        # Get prediction first
-        myopic_parents_encoded = {"None": 0, "One": 1, "Both": 2}.get(patient_data.myopic_parents, 0)
-        gender_encoded = 1 if patient_data.gender.upper() in ["M", "MALE"] else 0
-        
-        avg_spherical = (patient_data.re_spherical + patient_data.le_spherical) / 2
-        myopia_severity = abs(avg_spherical)
-        avg_axial_length = (patient_data.re_axial_length + patient_data.le_axial_length) / 2
-        years_since_diagnosis = patient_data.age - patient_data.age_diagnosis
-        screen_outdoor_ratio = patient_data.screen_hours / (patient_data.outdoor_hours + 0.1)
-        compliance_score = float(np.clip(patient_data.wearing_hours / 12, 0, 1))
+        # Model inference and PDF rendering are CPU-bound; keep them off the event loop
+        result = await run_in_threadpool(_prepare_request_cached, patient_data)
+        patient_info = result['patient_info']
         
-        features = [
-            patient_data.age,
-            patient_data.age_diagnosis,
-            years_since_diagnosis,
-            gender_encoded,
-            myopic_parents_encoded,
-            patient_data.outdoor_hours,
-            patient_data.screen_hours,
-            screen_outdoor_ratio,
-            1 if patient_data.had_myopia_control else 0,
-            myopia_severity,
-            1 if (patient_data.re_cylinder != 0 or patient_data.le_cylinder != 0) else 0,
-            avg_axial_length,
-            1 if avg_axial_length > 24.5 else 0,
-            patient_data.wearing_hours,
-            compliance_score
-        ]
-        
-        prediction_results = model_instance.predict(features)
-        
-        # Calculate additional analyses for report
-        risk_factors = _calculate_risk_factors(patient_data, avg_spherical, myopia_severity, avg_axial_length, compliance_score, myopic_parents_encoded)
-        progression_timeline = _calculate_progression_timeline(prediction_results['estimated_progression'], patient_data.age, myopia_severity)
-        comparative_stats = _calculate_comparative_stats(patient_data, myopia_severity, avg_axial_length)
-        
-        # Prepare patient info
-        patient_info = {
-            'name': patient_data.name or "Patient",
-            'age': patient_data.age,
-            'gender': patient_data.gender,
-            'date': None,
-            'age_diagnosis': patient_data.age_diagnosis,
-            'myopic_parents': myopic_parents_encoded,
-            'outdoor_hours': patient_data.outdoor_hours,
-            'screen_hours': patient_data.screen_hours,
-            're_spherical': patient_data.re_spherical,
-            're_cylinder': patient_data.re_cylinder,
-            'le_spherical': patient_data.le_spherical,
-            'le_cylinder': patient_data.le_cylinder,
-            're_axial_length': patient_data.re_axial_length,
-            'le_axial_length': patient_data.le_axial_length,
-            'avg_axial_length': avg_axial_length,
-            'myopia_severity': myopia_severity,
-            'wearing_hours': patient_data.wearing_hours,
-            'compliance_score': compliance_score,
-            'qol_score': patient_data.qol_score or 3,
-            'years_since_diagnosis': years_since_diagnosis,
-            'screen_outdoor_ratio': screen_outdoor_ratio
-        }
-        
-        # Generate report with additional analyses
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            output_path = tmp_file.name
-            
-        report_generator.generate_report(
+        # Generate report with additional analyses, in memory
+        buffer = io.BytesIO()
+        await run_in_threadpool(
+            report_generator.generate_report,
             patient_info, 
-            prediction_results, 
-            output_path,
-            risk_factors=risk_factors,
-            progression_timeline=progression_timeline,
-            comparative_stats=comparative_stats
+            result['prediction'], 
+            buffer,
+            risk_factors=result['risk_factors'],
+            progression_timeline=result['progression_timeline'],
+            comparative_stats=result['comparative_stats']
         )
         
-        return FileResponse(
-            output_path,
+        # Same Content-Disposition handling as FileResponse (RFC 5987 for non-ASCII names)
+        filename = f"stellest_report_{patient_info['name'].replace(' ', '_')}.pdf"
+        quoted_filename = quote(filename)
+        if quoted_filename != filename:
+            content_disposition = f"attachment; filename*=utf-8''{quoted_filename}"
+        else:
+            content_disposition = f'attachment; filename="{filename}"'
+        
+        return Response(
+            content=buffer.getvalue(),
             media_type='application/pdf',
-            filename=f"stellest_report_{patient_info['name'].replace(' ', '_')}.pdf"
+            headers={'Content-Disposition': content_disposition}
         )
         
     except Exception as e:
+        logger.exception("Report generation error")
         raise HTTPException(status_code=500, detail=f"Report generation error: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    logging.basicConfig(level=logging.INFO)
+    # Prediction caches live in each worker, so more workers means fewer hits
+    # for a report that follows its prediction; raise this only if needed
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    if workers == 1:
+        # Serve this module's app so the model loaded here is the one in use
+        load_model()
+        target = app
+    else:
+        # Workers import the app and load the model themselves; train once here
+        # only when there is no saved model, so they don't race to write it
+        if not os.path.exists(_MODEL_PATH):
+            load_model()
+        target = "api_server:app"
+    uvicorn.run(
+        target,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=workers
+    )
 
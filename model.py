@@ -1,27 +1,66 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingRegressor
+from sklearn.preprocessing import LabelEncoder
 import joblib
+import pickle
+from python_calamine import CalamineWorkbook
+import re
 import warnings
 warnings.filterwarnings('ignore')
 
+# Patterns used by the column parsers, compiled once at import
+_HOURS_RE = re.compile(r'(\d+(?:\.\d+)?)')
+_BOTH_PARENTS_RE = re.compile(r'BOTH|MOTHER, FATHER|FATHER, MOTHER')
+_ONE_PARENT_RE = re.compile(r'MOTHER|FATHER|ONE')
+_CYLINDER_SUFFIX_RE = re.compile(r'DC.*', re.DOTALL)
+
+# Saved models are compressed with lz4 when it is installed, zlib otherwise
+try:
+    import lz4  # noqa: F401
+    _MODEL_COMPRESSION = ('lz4', 3)
+except ImportError:
+    _MODEL_COMPRESSION = ('zlib', 3)
+
+# Raw columns holding a few distinct strings repeated across patients; loaded as
+# categoricals so each distinct value is parsed only once
+_CATEGORICAL_COLUMNS = (
+    'age', 'age_diagnosis', 'gender', 'myopic_parents', 'outdoor_time', 'screen_time',
+    're_spherical', 'le_spherical', 're_cylinder', 'le_cylinder', 'wearing_time', 'qol_score'
+)
+
+# Cell strings read_excel treats as missing by default; the chunked reader matches them
+_NA_STRINGS = frozenset((
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+))
+
+# Model input columns, in order; the API builds its feature rows in this order
+FEATURE_COLUMNS = (
+    'age', 'age_at_diagnosis', 'years_since_diagnosis', 'gender',
+    'myopic_parents', 'outdoor_hours', 'screen_hours', 'screen_outdoor_ratio',
+    'had_myopia_control', 'myopia_severity', 'has_astigmatism',
+    'avg_axial_length', 'axial_length_abnormal', 'wearing_hours', 'compliance_score'
+)
+
+def _cell_text(cell):
+    """Render a raw sheet cell as read_excel(dtype=str) would, or None if missing"""
+    if isinstance(cell, float) and cell.is_integer():
+        cell = int(cell)
+    text = str(cell)
+    return None if text in _NA_STRINGS else text
+
 class MyopiaPredictionModel:
     def __init__(self):
         self.progression_classifier = None
         self.progression_regressor = None
         self.label_encoders = {}
-        self.scaler = StandardScaler()
+        self.scaler = None  # Tree models are scale-invariant; only set by older saved models
         self.feature_importance = None
         
-    def load_and_preprocess_data(self, file_path):
-        """Load and preprocess the Stellest dataset"""
-        df = pd.read_excel(file_path, header=0)
-        
-        # Skip the first row which contains column descriptions
-        df = df.iloc[1:].reset_index(drop=True)
-        
+    def load_and_preprocess_data(self, file_path, chunk_size=None):
+        """Load and preprocess the Stellest dataset, optionally chunk_size rows at a time"""
         # Rename columns for easier handling
         column_mapping = {
             'Age': 'age',
@@ -43,214 +82,302 @@ class MyopiaPredictionModel:
             'QoL (1 - Poor; 5- Improved)': 'qol_score'
         }
         
+        if chunk_size:
+            return self._load_in_chunks(file_path, column_mapping, chunk_size)
+        
+        # Read only the mapped columns, as raw strings (the parsers below do the
+        # typing), skipping the second row which contains column descriptions
+        df = pd.read_excel(
+            file_path,
+            header=0,
+            skiprows=[1],
+            usecols=list(column_mapping),
+            dtype=str,
+            engine='calamine'
+        )
+        
         df = df.rename(columns=column_mapping)
+        df = df.astype(dict.fromkeys(_CATEGORICAL_COLUMNS, 'category'))
         
         # Process the data
         processed_df = self._process_features(df)
         
         return processed_df
     
+    def _load_in_chunks(self, file_path, column_mapping, chunk_size):
+        """Load and preprocess a large sheet without holding all raw strings in memory"""
+        sheet = CalamineWorkbook.from_path(file_path).get_sheet_by_index(0)
+        
+        # Features are row-local, so each chunk is parsed and derived on its own and
+        # only its numeric columns are kept; imputation needs the full columns
+        buffers, n_rows = {}, 0
+        for chunk in self._iter_raw_chunks(sheet, column_mapping, chunk_size):
+            features = self._derive_features(self._parse_columns(chunk))
+            if not buffers:
+                # Sized for every sheet row below the header and description rows
+                buffers = {
+                    name: np.empty(sheet.height - 2, dtype=np.float32 if values.dtype.kind == 'f' else values.dtype)
+                    for name, values in features.items()
+                }
+            for name, values in features.items():
+                buffers[name][n_rows:n_rows + len(chunk)] = values
+            n_rows += len(chunk)
+        
+        features = {name: values[:n_rows] for name, values in buffers.items()}
+        return self._impute_median(features, pd.RangeIndex(n_rows))
+    
+    def _iter_raw_chunks(self, sheet, column_mapping, chunk_size):
+        """Yield the mapped raw columns as string frames of up to chunk_size rows"""
+        rows = sheet.iter_rows()
+        
+        # Name header cells like read_excel: blanks become 'Unnamed: i', repeats get a '.n' suffix
+        names, seen = [], {}
+        for i, cell in enumerate(next(rows)):
+            name = str(cell) if cell != '' else f'Unnamed: {i}'
+            count = seen.get(name, 0)
+            seen[name] = count + 1
+            names.append(f'{name}.{count}' if count else name)
+        positions = [names.index(column) for column in column_mapping]
+        
+        # Skip the second row which contains column descriptions
+        next(rows, None)
+        
+        batch = []
+        for row in rows:
+            if all(cell == '' for cell in row):
+                continue  # read_excel skips blank rows
+            batch.append([_cell_text(row[i]) for i in positions])
+            if len(batch) == chunk_size:
+                yield self._raw_frame(batch, column_mapping)
+                batch = []
+        if batch:
+            yield self._raw_frame(batch, column_mapping)
+    
+    def _raw_frame(self, rows, column_mapping):
+        """Build a renamed raw frame from rows of cell strings"""
+        df = pd.DataFrame(rows, columns=list(column_mapping.values()), dtype=object)
+        return df.astype(dict.fromkeys(_CATEGORICAL_COLUMNS, 'category'))
+    
     def _process_features(self, df):
         """Process and extract features from raw data"""
-        processed = pd.DataFrame()
+        return self._impute_median(self._derive_features(self._parse_columns(df)), df.index)
+    
+    def _parse_columns(self, df):
+        """Parse the raw Excel columns into numeric arrays"""
+        return {
+            'age': self._parse_categorical(df['age'], self._parse_age),
+            'age_diagnosis': self._parse_categorical(df['age_diagnosis'], self._parse_age),
+            'gender': self._parse_categorical(df['gender'], self._parse_gender),
+            'myopic_parents': self._parse_categorical(df['myopic_parents'], self._parse_myopic_parents),
+            'outdoor_hours': self._parse_categorical(df['outdoor_time'], self._parse_hours),
+            'screen_hours': self._parse_categorical(df['screen_time'], self._parse_hours),
+            'had_myopia_control': df['myopia_control'].notna().to_numpy(),
+            're_spherical': self._parse_categorical(df['re_spherical'], self._parse_diopters),
+            'le_spherical': self._parse_categorical(df['le_spherical'], self._parse_diopters),
+            're_cylinder': self._parse_categorical(df['re_cylinder'], self._parse_diopters),
+            'le_cylinder': self._parse_categorical(df['le_cylinder'], self._parse_diopters),
+            're_axial_length': self._parse_axial_length(df['re_axial_length']).to_numpy(),
+            'le_axial_length': self._parse_axial_length(df['le_axial_length']).to_numpy(),
+            'wearing_hours': self._parse_categorical(df['wearing_time'], self._parse_hours),
+            'qol_score': self._parse_categorical(df['qol_score'], self._to_float),
+        }
+    
+    def _derive_features(self, raw):
+        """Compute every derived feature and target from the parsed arrays in one pass"""
+        features = {}
         
         # Age processing
-        processed['age'] = df['age'].apply(self._extract_age)
-        processed['age_diagnosis'] = df['age_diagnosis'].apply(self._extract_age)
-        processed['age_at_diagnosis'] = processed['age_diagnosis']
-        processed['years_since_diagnosis'] = processed['age'] - processed['age_diagnosis']
+        features['age'] = raw['age']
+        features['age_diagnosis'] = raw['age_diagnosis']
+        features['age_at_diagnosis'] = raw['age_diagnosis']
+        features['years_since_diagnosis'] = raw['age'] - raw['age_diagnosis']
         
         # Gender encoding
-        processed['gender'] = df['gender'].map({'M': 1, 'F': 0, 'Male': 1, 'Female': 0})
+        features['gender'] = raw['gender']
         
         # Myopic parents (risk factor)
-        processed['myopic_parents'] = df['myopic_parents'].apply(self._encode_myopic_parents)
+        features['myopic_parents'] = raw['myopic_parents']
         
         # Outdoor and screen time
-        processed['outdoor_hours'] = df['outdoor_time'].apply(self._extract_hours)
-        processed['screen_hours'] = df['screen_time'].apply(self._extract_hours)
-        processed['screen_outdoor_ratio'] = processed['screen_hours'] / (processed['outdoor_hours'] + 0.1)
+        features['outdoor_hours'] = raw['outdoor_hours']
+        features['screen_hours'] = raw['screen_hours']
+        features['screen_outdoor_ratio'] = raw['screen_hours'] / (raw['outdoor_hours'] + 0.1)
         
         # Previous myopia control
-        processed['had_myopia_control'] = df['myopia_control'].notna().astype(int)
+        features['had_myopia_control'] = raw['had_myopia_control'].astype(np.int8)
         
         # Refractive error
-        processed['re_spherical'] = df['re_spherical'].apply(self._extract_diopters)
-        processed['le_spherical'] = df['le_spherical'].apply(self._extract_diopters)
-        processed['avg_spherical'] = (processed['re_spherical'] + processed['le_spherical']) / 2
-        processed['myopia_severity'] = np.abs(processed['avg_spherical'])
+        features['re_spherical'] = raw['re_spherical']
+        features['le_spherical'] = raw['le_spherical']
+        features['avg_spherical'] = (raw['re_spherical'] + raw['le_spherical']) / 2
+        features['myopia_severity'] = np.abs(features['avg_spherical'])
         
         # Cylinder (astigmatism)
-        processed['re_cylinder'] = df['re_cylinder'].apply(self._extract_diopters)
-        processed['le_cylinder'] = df['le_cylinder'].apply(self._extract_diopters)
-        processed['has_astigmatism'] = ((processed['re_cylinder'] != 0) | (processed['le_cylinder'] != 0)).astype(int)
+        features['re_cylinder'] = raw['re_cylinder']
+        features['le_cylinder'] = raw['le_cylinder']
+        features['has_astigmatism'] = ((raw['re_cylinder'] != 0) | (raw['le_cylinder'] != 0)).astype(np.int8)
         
         # Axial length (key predictor)
-        processed['re_axial_length'] = df['re_axial_length'].apply(self._extract_axial_length)
-        processed['le_axial_length'] = df['le_axial_length'].apply(self._extract_axial_length)
-        processed['avg_axial_length'] = (processed['re_axial_length'] + processed['le_axial_length']) / 2
-        processed['axial_length_abnormal'] = (processed['avg_axial_length'] > 24.5).astype(int)
+        features['re_axial_length'] = raw['re_axial_length']
+        features['le_axial_length'] = raw['le_axial_length']
+        features['avg_axial_length'] = (raw['re_axial_length'] + raw['le_axial_length']) / 2
+        features['axial_length_abnormal'] = (features['avg_axial_length'] > 24.5).astype(np.int8)
         
         # Stellest wearing time
-        processed['wearing_hours'] = df['wearing_time'].apply(self._extract_hours)
-        processed['compliance_score'] = (processed['wearing_hours'] / 12).clip(0, 1)  # 12 hours is ideal
+        features['wearing_hours'] = raw['wearing_hours']
+        features['compliance_score'] = np.clip(raw['wearing_hours'] / 12, 0, 1)  # 12 hours is ideal
         
         # Quality of Life
-        processed['qol_score'] = pd.to_numeric(df['qol_score'], errors='coerce')
+        features['qol_score'] = raw['qol_score']
         
         # Target variables (progression prediction)
-        processed['progression_risk'] = self._calculate_progression_risk(processed)
-        processed['estimated_progression'] = self._estimate_progression(processed)
+        features['progression_risk'] = self._calculate_progression_risk(features)
+        features['estimated_progression'] = self._estimate_progression(features)
         
-        return processed.fillna(processed.median(numeric_only=True))
+        return features
+    
+    def _impute_median(self, features, index):
+        """Build the processed frame, filling missing float features with column medians"""
+        float_names = [name for name, values in features.items() if values.dtype.kind == 'f']
+        
+        # Write the float features into one preallocated float32 block and fill it in
+        # place; integer flags are never missing and are passed through as they are
+        block = np.empty((len(float_names), len(index)), dtype=np.float32)
+        for row, name in zip(block, float_names):
+            row[:] = features[name]
+        medians = np.nanmedian(block, axis=1)
+        rows, cols = np.nonzero(np.isnan(block))
+        block[rows, cols] = medians[rows]
+        
+        return pd.DataFrame({**features, **dict(zip(float_names, block))}, index=index)
+    
+    # Column parsers: each takes a raw Excel column (strings, numbers and blanks
+    # mixed) and parses it with vectorized string operations
+    
+    def _parse_categorical(self, column, parser):
+        """Run a column parser over a categorical column's distinct values and map back by code"""
+        # A trailing missing cell gives code -1 (missing) its parsed value too
+        uniques = pd.Series(np.append(column.cat.categories.to_numpy(dtype=object), None))
+        return np.asarray(parser(uniques))[column.cat.codes.to_numpy()]
+    
+    def _as_text(self, column):
+        """Raw cells as strings, keeping missing cells missing"""
+        return column.astype(str).where(column.notna())
+    
+    def _to_float(self, text):
+        """Parse strings to float; anything unparseable becomes NaN"""
+        return pd.to_numeric(text, errors='coerce').astype(float)
     
-    def _extract_age(self, age_str):
-        """Extract numeric age from string"""
-        if pd.isna(age_str):
-            return np.nan
-        age_str = str(age_str).upper()
-        try:
-            if 'YRS' in age_str or 'YR' in age_str:
-                return float(age_str.replace('YRS', '').replace('YR', '').strip())
-            return float(age_str)
-        except:
-            return np.nan
+    def _parse_age(self, column):
+        """Extract numeric age from strings like '9YRS'"""
+        text = self._as_text(column).str.upper()
+        text = text.str.replace('YRS', '', regex=False).str.replace('YR', '', regex=False)
+        return self._to_float(text.str.strip())
     
-    def _encode_myopic_parents(self, value):
-        """Encode myopic parents history"""
-        if pd.isna(value):
-            return 0
-        value = str(value).upper()
-        if 'BOTH' in value or 'MOTHER, FATHER' in value or 'FATHER, MOTHER' in value:
-            return 2
-        elif 'MOTHER' in value or 'FATHER' in value or 'ONE' in value:
-            return 1
-        return 0
+    def _parse_gender(self, column):
+        """Encode gender (1 = male, 0 = female)"""
+        return column.map({'M': 1, 'F': 0, 'Male': 1, 'Female': 0}).astype(float)
     
-    def _extract_hours(self, time_str):
-        """Extract hours from time string"""
-        if pd.isna(time_str):
-            return np.nan
-        time_str = str(time_str).lower()
-        try:
-            if 'hr' in time_str:
-                # Extract first number
-                import re
-                numbers = re.findall(r'\d+(?:\.\d+)?', time_str)
-                if numbers:
-                    return float(numbers[0])
-            return float(time_str)
-        except:
-            return np.nan
+    def _parse_myopic_parents(self, column):
+        """Encode myopic parents history (2 = both, 1 = one, 0 = none/unknown)"""
+        text = self._as_text(column).str.upper()
+        both = text.str.contains(_BOTH_PARENTS_RE, na=False)
+        one = text.str.contains(_ONE_PARENT_RE, na=False)
+        return np.select([both, one], [2, 1], default=0).astype(np.int8)
     
-    def _extract_diopters(self, value):
-        """Extract diopter value from string"""
-        if pd.isna(value) or value == 0:
-            return 0.0
-        value_str = str(value).upper()
-        try:
-            if 'DS' in value_str:
-                value_str = value_str.replace('DS', '').strip()
-            if 'DC' in value_str:
-                value_str = value_str.split('DC')[0].strip()
-            return float(value_str)
-        except:
-            return 0.0
+    def _parse_hours(self, column):
+        """Extract hours from strings like '2HRS/DAY'"""
+        text = self._as_text(column).str.lower()
+        # Strings mentioning hours use their first number; anything else must be a plain number
+        first_number = self._to_float(text.str.extract(_HOURS_RE, expand=False))
+        plain_number = self._to_float(text.str.strip())
+        return first_number.where(text.str.contains('hr', regex=False, na=False), plain_number)
     
-    def _extract_axial_length(self, value):
-        """Extract axial length in mm"""
-        if pd.isna(value):
-            return np.nan
-        value_str = str(value).upper()
-        try:
-            value_str = value_str.replace('MM', '').strip()
-            return float(value_str)
-        except:
-            return np.nan
+    def _parse_diopters(self, column):
+        """Extract diopter value from strings like '-2.50DS' or '-0.75DC*180'"""
+        text = self._as_text(column).str.upper().str.replace('DS', '', regex=False)
+        text = text.str.replace(_CYLINDER_SUFFIX_RE, '', regex=True)
+        return self._to_float(text.str.strip()).fillna(0.0)
     
-    def _calculate_progression_risk(self, df):
+    def _parse_axial_length(self, column):
+        """Extract axial length in mm from strings like '24.50MM'"""
+        text = self._as_text(column).str.upper().str.replace('MM', '', regex=False)
+        return self._to_float(text.str.strip())
+    
+    def _calculate_progression_risk(self, features):
         """Calculate progression risk category based on multiple factors"""
-        risk_score = 0
-        
-        # Age factor (younger = higher risk)
-        risk_score += (df['age'] < 10) * 2
-        risk_score += ((df['age'] >= 10) & (df['age'] < 12)) * 1
-        
-        # Myopic parents
-        risk_score += df['myopic_parents']
-        
-        # Screen time
-        risk_score += (df['screen_hours'] > 3) * 1
-        
-        # Outdoor time (protective)
-        risk_score -= (df['outdoor_hours'] > 2) * 1
-        
-        # Severity
-        risk_score += (df['myopia_severity'] > 3) * 2
-        risk_score += ((df['myopia_severity'] > 1.5) & (df['myopia_severity'] <= 3)) * 1
-        
-        # Axial length
-        risk_score += (df['avg_axial_length'] > 24.5) * 2
+        age = features['age']
+        severity = features['myopia_severity']
+        
+        risk_score = (
+            # Age factor (younger = higher risk)
+            (age < 10) * 2 + ((age >= 10) & (age < 12))
+            # Myopic parents
+            + features['myopic_parents']
+            # Screen time
+            + (features['screen_hours'] > 3)
+            # Outdoor time (protective)
+            - (features['outdoor_hours'] > 2)
+            # Severity
+            + (severity > 3) * 2 + ((severity > 1.5) & (severity <= 3))
+            # Axial length
+            + (features['avg_axial_length'] > 24.5) * 2
+        )
         
-        # Categorize: 0=Low, 1=Medium, 2=High
-        return pd.cut(risk_score, bins=[-np.inf, 2, 4, np.inf], labels=[0, 1, 2]).astype(int)
+        # Categorize: 0=Low (<= 2), 1=Medium (<= 4), 2=High
+        return np.digitize(risk_score, [2, 4], right=True).astype(np.int8)
     
-    def _estimate_progression(self, df):
+    def _estimate_progression(self, features):
         """Estimate myopia progression rate (diopters per year)"""
+        age = features['age']
+        
         # Baseline progression based on age
         base_progression = 0.5
         
         # Age factor
-        age_factor = np.where(df['age'] < 10, 1.5, np.where(df['age'] < 12, 1.2, 0.8))
+        age_factor = np.select([age < 10, age < 12], [1.5, 1.2], default=0.8)
         
         # Genetic factor
-        genetic_factor = 1 + (df['myopic_parents'] * 0.2)
+        genetic_factor = 1 + (features['myopic_parents'] * 0.2)
         
         # Environmental factor
-        env_factor = 1 + (df['screen_hours'] / 10) - (df['outdoor_hours'] / 10)
+        env_factor = 1 + (features['screen_hours'] / 10) - (features['outdoor_hours'] / 10)
         
         # Stellest effect (reduces progression by ~60-67%)
-        stellest_effect = 0.4 * df['compliance_score']
+        stellest_effect = 0.4 * features['compliance_score']
         
         progression = base_progression * age_factor * genetic_factor * env_factor * stellest_effect
         
-        return progression.clip(0, 2)  # Max 2 diopters per year
+        return np.clip(progression, 0, 2, out=progression)  # Max 2 diopters per year
     
     def train_models(self, df):
         """Train ML models for prediction"""
         # Select features
-        feature_cols = [
-            'age', 'age_at_diagnosis', 'years_since_diagnosis', 'gender',
-            'myopic_parents', 'outdoor_hours', 'screen_hours', 'screen_outdoor_ratio',
-            'had_myopia_control', 'myopia_severity', 'has_astigmatism',
-            'avg_axial_length', 'axial_length_abnormal', 'wearing_hours', 'compliance_score'
-        ]
-        
-        X = df[feature_cols].copy()
-        y_class = df['progression_risk']
-        y_reg = df['estimated_progression']
+        feature_cols = list(FEATURE_COLUMNS)
         
-        # Handle any remaining NaN values
-        X = X.fillna(X.median())
-        
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
+        # Tree models are scale-invariant, so train on the raw features
+        X_train = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32))
+        y_class = df['progression_risk'].to_numpy(dtype=np.int8)
+        y_reg = df['estimated_progression'].to_numpy(dtype=np.float32)
         
         # Train classification model (risk category)
         self.progression_classifier = RandomForestClassifier(
             n_estimators=100, 
             max_depth=10,
-            random_state=42
+            random_state=42,
+            n_jobs=-1
         )
-        self.progression_classifier.fit(X_scaled, y_class)
+        self.progression_classifier.fit(X_train, y_class)
         
         # Train regression model (progression rate)
-        self.progression_regressor = GradientBoostingRegressor(
-            n_estimators=100,
+        self.progression_regressor = HistGradientBoostingRegressor(
+            max_iter=100,
             max_depth=5,
-            random_state=42
+            min_samples_leaf=1,
+            random_state=42,
+            early_stopping=False
         )
-        self.progression_regressor.fit(X_scaled, y_reg)
+        self.progression_regressor.fit(X_train, y_reg)
         
         # Store feature importance
         self.feature_importance = pd.DataFrame({
@@ -259,49 +386,68 @@ class MyopiaPredictionModel:
         }).sort_values('importance', ascending=False)
         
         print("✓ Models trained successfully")
-        print(f"✓ Classification Accuracy: {self.progression_classifier.score(X_scaled, y_class):.2%}")
-        print(f"✓ Regression R² Score: {self.progression_regressor.score(X_scaled, y_reg):.2f}")
+        print(f"✓ Classification Accuracy: {self.progression_classifier.score(X_train, y_class):.2%}")
+        print(f"✓ Regression R² Score: {self.progression_regressor.score(X_train, y_reg):.2f}")
         
-        return X.columns.tolist()
+        return feature_cols
     
     def predict(self, patient_data):
         """Make predictions for a new patient"""
-        # Prepare features
-        X = self.scaler.transform([patient_data])
-        
-        # Predictions
-        risk_category = int(self.progression_classifier.predict(X)[0])  # Convert to int
-        risk_probability = self.progression_classifier.predict_proba(X)[0]
-        progression_rate = float(self.progression_regressor.predict(X)[0])  # Convert to float
+        # Accepts a flat feature list or a (1, n_features) row
+        return self.predict_batch(np.asarray(patient_data, dtype=np.float32).reshape(1, -1))[0]
+    
+    def predict_batch(self, patients):
+        """Make predictions for an (n_patients, n_features) array of patients"""
+        patients = np.ascontiguousarray(patients, dtype=np.float32)
+        X = patients if self.scaler is None else self.scaler.transform(patients)
+        
+        # Predictions (one call per estimator for the whole batch)
+        risk_categories = self.progression_classifier.predict(X).tolist()
+        risk_probabilities = self.progression_classifier.predict_proba(X).tolist()
+        progression_rates = self.progression_regressor.predict(X)
+        
+        # Compliance score is the last feature
+        without_stellest, benefit_pct = self._calculate_stellest_benefit(
+            patients[:, -1].astype(np.float64), progression_rates
+        )
         
         risk_labels = ['Low Risk', 'Medium Risk', 'High Risk']
         
-        return {
-            'risk_category': risk_labels[risk_category],
-            'risk_score': int(risk_category),  # Ensure int type
-            'risk_probabilities': {
-                'low': float(risk_probability[0]),  # Convert numpy float to Python float
-                'medium': float(risk_probability[1]),
-                'high': float(risk_probability[2])
-            },
-            'estimated_progression': round(progression_rate, 2),
-            'stellest_effectiveness': self._calculate_stellest_benefit(patient_data, progression_rate)
-        }
+        return [
+            {
+                'risk_category': risk_labels[risk_category],
+                'risk_score': risk_category,
+                'risk_probabilities': {
+                    'low': risk_probability[0],
+                    'medium': risk_probability[1],
+                    'high': risk_probability[2]
+                },
+                'estimated_progression': round(progression_rate, 2),
+                'stellest_effectiveness': {
+                    'without_stellest': round(without, 2),
+                    'with_stellest': round(progression_rate, 2),
+                    'reduction_percentage': round(benefit, 1)
+                }
+            }
+            for risk_category, risk_probability, progression_rate, without, benefit
+            in zip(risk_categories, risk_probabilities, progression_rates.tolist(),
+                   without_stellest.tolist(), benefit_pct.tolist())
+        ]
     
-    def _calculate_stellest_benefit(self, patient_data, current_progression):
-        """Calculate expected benefit of Stellest lens"""
-        # Without Stellest (estimated)
-        compliance_score = patient_data[-1] if len(patient_data) > 0 else 1.0
-        without_stellest = current_progression / (0.4 * compliance_score) if compliance_score > 0 else current_progression / 0.4
+    def _calculate_stellest_benefit(self, compliance_score, current_progression):
+        """Calculate expected benefit of Stellest lens for arrays of patients"""
+        # Without Stellest (estimated); no compliance falls back to the full lens effect
+        without_stellest = current_progression / (0.4 * np.where(compliance_score > 0, compliance_score, 1.0))
         
         # Benefit percentage
-        benefit_pct = ((without_stellest - current_progression) / without_stellest) * 100 if without_stellest > 0 else 0
+        has_progression = without_stellest > 0
+        benefit_pct = np.where(
+            has_progression,
+            (without_stellest - current_progression) / np.where(has_progression, without_stellest, 1.0) * 100,
+            0.0
+        )
         
-        return {
-            'without_stellest': float(round(without_stellest, 2)),  # Convert to Python float
-            'with_stellest': float(round(current_progression, 2)),
-            'reduction_percentage': float(round(benefit_pct, 1))
-        }
+        return without_stellest, benefit_pct
     
     def save_model(self, path='stellest_model.pkl'):
         """Save trained model"""
@@ -311,7 +457,9 @@ class MyopiaPredictionModel:
             'scaler': self.scaler,
             'feature_importance': self.feature_importance
         }
-        joblib.dump(model_data, path)
+        # Served models predict one patient at a time, where a thread pool only adds overhead
+        self.progression_classifier.set_params(n_jobs=1)
+        joblib.dump(model_data, path, compress=_MODEL_COMPRESSION, protocol=pickle.HIGHEST_PROTOCOL)
         print(f"✓ Model saved to {path}")
     
     def load_model(self, path='stellest_model.pkl'):
@@ -319,7 +467,7 @@ class MyopiaPredictionModel:
         model_data = joblib.load(path)
         self.progression_classifier = model_data['classifier']
         self.progression_regressor = model_data['regressor']
-        self.scaler = model_data['scaler']
+        self.scaler = model_data.get('scaler')
         self.feature_importance = model_data['feature_importance']
         print(f"✓ Model loaded from {path}")
 
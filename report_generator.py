@@ -1,55 +1,258 @@
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-from datetime import datetime
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from functools import lru_cache, partial
+import hashlib
 import io
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import numpy as np
+import os
+import pickle
+import tempfile
+
+def _build_styles():
+    """Sample stylesheet plus the report's custom paragraph styles"""
+    styles = getSampleStyleSheet()
+    
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#2E86AB'),
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='CustomBody',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=12,
+        alignment=TA_JUSTIFY
+    ))
+    
+    return styles
+
+# Styles are built once at import and shared by every report
+_STYLES = _build_styles()
+
+_PATIENT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+])
+
+_CLINICAL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+])
+
+_EFFECTIVENESS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#06A77D')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+])
+
+_TIMELINE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+])
+
+# Finished PDFs can be cached on disk by a hash of the report inputs; set
+# STELLEST_REPORT_CACHE to a directory to enable it
+_CACHE_DIR = os.getenv('STELLEST_REPORT_CACHE', '')
+
+_MONITORING_HTML = (
+    "<b>Monitoring Parameters:</b><br/>"
+    "• Refraction (spherical and cylindrical)<br/>"
+    "• Axial length measurement<br/>"
+    "• Visual acuity assessment<br/>"
+    "• Compliance with Stellest wearing schedule<br/>"
+    "• Quality of life assessment"
+)
+
+_DISCLAIMER_HTML = (
+    "<i>This report is generated by Stellest AI using machine learning algorithms trained on clinical data. "
+    "It should be used as a clinical decision support tool and not as a replacement for professional medical judgment. "
+    "Please consult with an eye care professional for comprehensive assessment and treatment planning.</i>"
+)
+
+# Recommendations every report opens and closes with
+_REC_FIRST = (
+    "Continue wearing Stellest lenses for at least 12 hours daily to achieve optimal myopia control effect.",
+)
+
+_REC_LAST = (
+    "Maintain good reading distance (at least 30cm from eyes) and ensure adequate lighting during near work.",
+    "Consider nutritional support with foods rich in Omega-3 fatty acids and antioxidants for overall eye health.",
+)
+
+_RISK_PROBABILITY_LABELS = (
+    ('low', 'Low Risk'),
+    ('medium', 'Medium Risk'),
+    ('high', 'High Risk'),
+)
+
+_RISK_COLORS = {
+    'Low Risk': '#06A77D',
+    'Medium Risk': '#F18F01',
+    'High Risk': '#C73E1D'
+}
+
+_PARENT_LABELS = ('None', 'One parent', 'Both parents')
+
+# (applies, message) pairs for the "Risk Factor Analysis" bullets, in report order
+_RISK_RULES = [
+    (lambda p: p.get('myopic_parents', 0) > 0,
+     lambda p: f"• Parental myopia history ({_PARENT_LABELS[min(p['myopic_parents'], 2)]})"),
+    (lambda p: p.get('age', 15) < 12,
+     lambda p: f"• Young age ({p['age']} years) - higher progression risk"),
+    (lambda p: p.get('screen_hours', 0) > 3,
+     lambda p: f"• High screen time ({p['screen_hours']} hours/day)"),
+    (lambda p: p.get('outdoor_hours', 0) < 2,
+     lambda p: f"• Limited outdoor time ({p.get('outdoor_hours', 0)} hours/day)"),
+    (lambda p: p.get('myopia_severity', 0) > 3,
+     lambda p: f"• High myopia severity ({p['myopia_severity']} D)"),
+    (lambda p: p.get('avg_axial_length', 23) > 24.5,
+     lambda p: f"• Elongated axial length ({p['avg_axial_length']} mm)"),
+]
+
+@lru_cache(maxsize=None)
+def _parse_markup(text, style_name):
+    """Parsed fragments of fixed paragraph markup, shared by every report"""
+    return Paragraph(text, _STYLES[style_name]).frags
+
+def _static_paragraph(text, style_name):
+    """Paragraph for fixed markup that skips re-parsing it on every report"""
+    return Paragraph(text, _STYLES[style_name], frags=_parse_markup(text, style_name))
 
 class MyopiaReportGenerator:
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
-        
-    def _create_custom_styles(self):
-        """Create custom paragraph styles"""
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#2E86AB'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#2E86AB'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CustomBody',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=12,
-            alignment=TA_JUSTIFY
-        ))
+    def __init__(self, cache_dir=_CACHE_DIR):
+        self.styles = _STYLES
+        self.cache_dir = cache_dir
     
     def generate_report(self, patient_info, prediction_results, output_path, risk_factors=None, progression_timeline=None, comparative_stats=None):
-        """Generate comprehensive PDF report"""
+        """Generate comprehensive PDF report; output_path may be a file path or a writable binary stream"""
+        # The report shows today's date, so it is part of the cache key
+        report_date = datetime.now().strftime("%B %d, %Y")
+        cache_path = self._cache_path(
+            report_date, patient_info, prediction_results, risk_factors, progression_timeline, comparative_stats
+        )
+        
+        if cache_path is None:
+            # Nothing to keep a copy for, so lay out straight into the destination
+            self._build_pdf(
+                output_path, report_date, patient_info, prediction_results, risk_factors, progression_timeline, comparative_stats
+            )
+            return output_path
+        
+        pdf = self._read_cached(cache_path)
+        if pdf is None:
+            buffer = io.BytesIO()
+            self._build_pdf(
+                buffer, report_date, patient_info, prediction_results, risk_factors, progression_timeline, comparative_stats
+            )
+            pdf = buffer.getvalue()
+            self._write_cached(cache_path, pdf)
+        
+        if hasattr(output_path, 'write'):
+            output_path.write(pdf)
+        else:
+            with open(output_path, 'wb') as f:
+                f.write(pdf)
+        return output_path
+    
+    def generate_reports_batch(self, jobs, max_workers=None):
+        """Generate several reports in worker processes; each job holds generate_report keyword arguments"""
+        generate = partial(_generate_one, type(self), self.cache_dir)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(generate, jobs))
+    
+    def _cache_path(self, *report_inputs):
+        """Cache file for a set of report inputs, or None when caching is disabled"""
+        if not self.cache_dir:
+            return None
+        key = hashlib.blake2b(pickle.dumps(report_inputs, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+    
+    def _read_cached(self, cache_path):
+        """Cached PDF bytes, or None on a miss"""
+        try:
+            with open(cache_path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _write_cached(self, cache_path, pdf):
+        """Store a finished PDF; the cache is best effort, so write failures are ignored"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file and rename it into place so readers never see a partial PDF
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                f.write(pdf)
+            os.replace(f.name, cache_path)
+        except OSError:
+            pass
+        self._prune_cache()
+    
+    def _prune_cache(self):
+        """Delete cached PDFs from earlier days; their keys include the report date, so they can never hit again"""
+        start_of_day = datetime.combine(date.today(), time.min).timestamp()
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.name.endswith(('.pdf', '.tmp')) and entry.stat().st_mtime < start_of_day:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+    
+    def _build_pdf(self, output, report_date, patient_info, prediction_results, risk_factors, progression_timeline, comparative_stats):
+        """Lay out the report into a file path or binary stream"""
         doc = SimpleDocTemplate(
-            output_path,
+            output,
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
@@ -57,102 +260,100 @@ class MyopiaReportGenerator:
             bottomMargin=18
         )
         
-        story = []
-        
-        # Header
-        story.append(Paragraph("Stellest AI", self.styles['CustomTitle']))
-        story.append(Paragraph("Myopia Progression Assessment Report", self.styles['Heading2']))
-        story.append(Spacer(1, 0.2 * inch))
-        
-        # Report metadata
-        report_date = datetime.now().strftime("%B %d, %Y")
-        story.append(Paragraph(f"<b>Report Date:</b> {report_date}", self.styles['CustomBody']))
-        story.append(Spacer(1, 0.3 * inch))
+        report = {
+            'report_date': report_date,
+            'patient_info': patient_info,
+            'prediction_results': prediction_results,
+            'risk_factors': risk_factors,
+            'progression_timeline': progression_timeline,
+            'comparative_stats': comparative_stats,
+        }
+        story = [flowable for section in self._SECTIONS for flowable in section(self, report)]
         
-        # Patient Information
-        story.append(Paragraph("Patient Information", self.styles['CustomHeading']))
+        # Build PDF
+        doc.build(story)
+    
+    def _header_section(self, report):
+        """Title block with the report date"""
+        return (
+            _static_paragraph("Stellest AI", 'CustomTitle'),
+            _static_paragraph("Myopia Progression Assessment Report", 'Heading2'),
+            Spacer(1, 0.2 * inch),
+            Paragraph(f"<b>Report Date:</b> {report['report_date']}", self.styles['CustomBody']),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _patient_section(self, report):
+        """Patient Information table"""
+        patient_info = report['patient_info']
         patient_data = [
             ['Field', 'Value'],
             ['Patient Name', patient_info.get('name', 'N/A')],
             ['Age', f"{patient_info.get('age', 'N/A')} years"],
             ['Gender', patient_info.get('gender', 'N/A')],
-            ['Date of Assessment', patient_info.get('date', report_date)],
+            ['Date of Assessment', patient_info.get('date', report['report_date'])],
         ]
         
         patient_table = Table(patient_data, colWidths=[2.5 * inch, 3 * inch])
-        patient_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-        ]))
-        story.append(patient_table)
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Clinical Data
-        story.append(Paragraph("Clinical Assessment", self.styles['CustomHeading']))
+        patient_table.setStyle(_PATIENT_TABLE_STYLE)
+        return (
+            _static_paragraph("Patient Information", 'CustomHeading'),
+            patient_table,
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _clinical_section(self, report):
+        """Per-eye refraction and axial length table"""
+        patient_info = report['patient_info']
         clinical_data = [
             ['Parameter', 'Right Eye', 'Left Eye'],
-            ['Spherical (D)', 
+            ['Spherical (D)',
              f"{patient_info.get('re_spherical', 'N/A')}",
              f"{patient_info.get('le_spherical', 'N/A')}"],
-            ['Cylinder (D)', 
+            ['Cylinder (D)',
              f"{patient_info.get('re_cylinder', 'N/A')}",
              f"{patient_info.get('le_cylinder', 'N/A')}"],
-            ['Axial Length (mm)', 
+            ['Axial Length (mm)',
              f"{patient_info.get('re_axial_length', 'N/A')}",
              f"{patient_info.get('le_axial_length', 'N/A')}"],
         ]
         
         clinical_table = Table(clinical_data, colWidths=[2.5 * inch, 1.5 * inch, 1.5 * inch])
-        clinical_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-        ]))
-        story.append(clinical_table)
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Risk Assessment - MAIN RESULTS
-        story.append(Paragraph("AI-Powered Risk Assessment", self.styles['CustomHeading']))
-        
+        clinical_table.setStyle(_CLINICAL_TABLE_STYLE)
+        return (
+            _static_paragraph("Clinical Assessment", 'CustomHeading'),
+            clinical_table,
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _risk_assessment_section(self, report):
+        """Predicted risk category, probabilities and progression rate"""
+        prediction_results = report['prediction_results']
         risk_category = prediction_results['risk_category']
         risk_color = self._get_risk_color(risk_category)
-        
-        story.append(Paragraph(
-            f"<b>Progression Risk:</b> <font color='{risk_color}'>{risk_category}</font>",
-            self.styles['CustomBody']
-        ))
-        
         risk_probs = prediction_results['risk_probabilities']
-        story.append(Paragraph(
-            f"<b>Risk Probabilities:</b><br/>"
-            f"• Low Risk: {risk_probs['low']:.1%}<br/>"
-            f"• Medium Risk: {risk_probs['medium']:.1%}<br/>"
-            f"• High Risk: {risk_probs['high']:.1%}",
-            self.styles['CustomBody']
-        ))
-        
-        story.append(Paragraph(
-            f"<b>Estimated Progression Rate:</b> {prediction_results['estimated_progression']} D/year",
-            self.styles['CustomBody']
-        ))
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Stellest Effectiveness
-        story.append(Paragraph("Stellest Lens Effectiveness", self.styles['CustomHeading']))
-        stellest_data = prediction_results['stellest_effectiveness']
+        
+        return (
+            _static_paragraph("AI-Powered Risk Assessment", 'CustomHeading'),
+            Paragraph(
+                f"<b>Progression Risk:</b> <font color='{risk_color}'>{risk_category}</font>",
+                self.styles['CustomBody']
+            ),
+            Paragraph(
+                "<b>Risk Probabilities:</b><br/>"
+                + "<br/>".join(f"• {label}: {risk_probs[key]:.1%}" for key, label in _RISK_PROBABILITY_LABELS),
+                self.styles['CustomBody']
+            ),
+            Paragraph(
+                f"<b>Estimated Progression Rate:</b> {prediction_results['estimated_progression']} D/year",
+                self.styles['CustomBody']
+            ),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _effectiveness_section(self, report):
+        """Progression with and without Stellest"""
+        stellest_data = report['prediction_results']['stellest_effectiveness']
         
         effectiveness_table = [
             ['Metric', 'Value'],
@@ -162,75 +363,65 @@ class MyopiaReportGenerator:
         ]
         
         eff_table = Table(effectiveness_table, colWidths=[3 * inch, 2.5 * inch])
-        eff_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#06A77D')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-        ]))
-        story.append(eff_table)
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Risk Factors
-        story.append(Paragraph("Risk Factor Analysis", self.styles['CustomHeading']))
-        
-        risk_factors = []
-        if patient_info.get('myopic_parents', 0) > 0:
-            risk_factors.append(f"• Parental myopia history ({['None', 'One parent', 'Both parents'][patient_info.get('myopic_parents', 0)]})")
-        
-        if patient_info.get('age', 15) < 12:
-            risk_factors.append(f"• Young age ({patient_info.get('age')} years) - higher progression risk")
-        
-        if patient_info.get('screen_hours', 0) > 3:
-            risk_factors.append(f"• High screen time ({patient_info.get('screen_hours')} hours/day)")
-        
-        if patient_info.get('outdoor_hours', 0) < 2:
-            risk_factors.append(f"• Limited outdoor time ({patient_info.get('outdoor_hours')} hours/day)")
-        
-        if patient_info.get('myopia_severity', 0) > 3:
-            risk_factors.append(f"• High myopia severity ({patient_info.get('myopia_severity')} D)")
-        
-        if patient_info.get('avg_axial_length', 23) > 24.5:
-            risk_factors.append(f"• Elongated axial length ({patient_info.get('avg_axial_length')} mm)")
-        
-        if risk_factors:
-            story.append(Paragraph("Identified Risk Factors:", self.styles['CustomBody']))
-            for factor in risk_factors:
-                story.append(Paragraph(factor, self.styles['CustomBody']))
+        eff_table.setStyle(_EFFECTIVENESS_TABLE_STYLE)
+        return (
+            _static_paragraph("Stellest Lens Effectiveness", 'CustomHeading'),
+            eff_table,
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _risk_factor_section(self, report):
+        """Bullets for each risk rule the patient matches"""
+        patient_info = report['patient_info']
+        risk_factor_bullets = [message(patient_info) for applies, message in _RISK_RULES if applies(patient_info)]
+        
+        # List items share one paragraph; a blank line keeps the spacing of separate paragraphs
+        if risk_factor_bullets:
+            risk_factor_text = "<br/><br/>".join(["Identified Risk Factors:", *risk_factor_bullets])
         else:
-            story.append(Paragraph("No significant risk factors identified.", self.styles['CustomBody']))
+            risk_factor_text = "No significant risk factors identified."
         
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Recommendations
-        story.append(Paragraph("Clinical Recommendations", self.styles['CustomHeading']))
-        recommendations = self._generate_recommendations(patient_info, prediction_results)
-        
-        for i, rec in enumerate(recommendations, 1):
-            story.append(Paragraph(f"{i}. {rec}", self.styles['CustomBody']))
-        
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Detailed Analysis Section
-        story.append(Paragraph("Detailed Clinical Analysis", self.styles['CustomHeading']))
+        return (
+            _static_paragraph("Risk Factor Analysis", 'CustomHeading'),
+            Paragraph(risk_factor_text, self.styles['CustomBody']),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _recommendations_section(self, report):
+        """Numbered clinical recommendations"""
+        recommendations = self._generate_recommendations(report['patient_info'], report['prediction_results'])
+        
+        return (
+            _static_paragraph("Clinical Recommendations", 'CustomHeading'),
+            Paragraph(
+                "<br/><br/>".join(f"{i}. {rec}" for i, rec in enumerate(recommendations, 1)),
+                self.styles['CustomBody']
+            ),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _analysis_section(self, report):
+        """Detailed Clinical Analysis bullets"""
+        patient_info = report['patient_info']
+        age = patient_info.get('age', 15)
+        myopic_parents = patient_info.get('myopic_parents', 0)
+        screen_hrs = patient_info.get('screen_hours', 0)
+        outdoor_hrs = patient_info.get('outdoor_hours', 0)
+        severity = patient_info.get('myopia_severity', 0)
+        axial_len = patient_info.get('avg_axial_length', 23)
+        compliance = patient_info.get('compliance_score', 1) * 100
         
         analysis_items = []
         
         # Age-based analysis
-        if patient_info.get('age', 15) < 10:
-            analysis_items.append(f"<b>Age Factor:</b> Patient is {patient_info.get('age')} years old, which indicates higher progression risk. Younger children typically show faster myopia progression.")
-        elif patient_info.get('age', 15) < 12:
-            analysis_items.append(f"<b>Age Factor:</b> Patient is {patient_info.get('age')} years old, indicating moderate progression risk. Close monitoring is recommended.")
+        if age < 10:
+            analysis_items.append(f"<b>Age Factor:</b> Patient is {age} years old, which indicates higher progression risk. Younger children typically show faster myopia progression.")
+        elif age < 12:
+            analysis_items.append(f"<b>Age Factor:</b> Patient is {age} years old, indicating moderate progression risk. Close monitoring is recommended.")
         else:
-            analysis_items.append(f"<b>Age Factor:</b> Patient is {patient_info.get('age')} years old. Progression typically slows with age, but monitoring remains important.")
+            analysis_items.append(f"<b>Age Factor:</b> Patient is {age} years old. Progression typically slows with age, but monitoring remains important.")
         
         # Genetic analysis
-        myopic_parents = patient_info.get('myopic_parents', 0)
         if myopic_parents == 2:
             analysis_items.append("<b>Genetic Risk:</b> Both parents have myopia, indicating strong genetic predisposition. This increases progression risk significantly.")
         elif myopic_parents == 1:
@@ -239,7 +430,6 @@ class MyopiaReportGenerator:
             analysis_items.append("<b>Genetic Risk:</b> No parental myopia history. Lower genetic risk factor.")
         
         # Severity analysis
-        severity = patient_info.get('myopia_severity', 0)
         if severity > 3:
             analysis_items.append(f"<b>Myopia Severity:</b> High myopia ({severity:.2f} D) detected. Requires intensive management and regular monitoring.")
         elif severity > 1.5:
@@ -248,7 +438,6 @@ class MyopiaReportGenerator:
             analysis_items.append(f"<b>Myopia Severity:</b> Mild myopia ({severity:.2f} D). Early intervention can help slow progression.")
         
         # Axial length analysis
-        axial_len = patient_info.get('avg_axial_length', 23)
         if axial_len > 24.5:
             analysis_items.append(f"<b>Axial Length:</b> {axial_len:.2f} mm - Above normal range (>24.5mm). Indicates significant eye elongation and higher risk.")
         elif axial_len > 24.0:
@@ -257,7 +446,6 @@ class MyopiaReportGenerator:
             analysis_items.append(f"<b>Axial Length:</b> {axial_len:.2f} mm - Within normal range. Continue preventive measures.")
         
         # Compliance analysis
-        compliance = patient_info.get('compliance_score', 1) * 100
         if compliance >= 90:
             analysis_items.append(f"<b>Treatment Compliance:</b> Excellent ({compliance:.0f}%). Patient is wearing lenses as recommended.")
         elif compliance >= 75:
@@ -266,8 +454,6 @@ class MyopiaReportGenerator:
             analysis_items.append(f"<b>Treatment Compliance:</b> Needs improvement ({compliance:.0f}%). Better compliance will significantly improve outcomes.")
         
         # Lifestyle analysis
-        screen_hrs = patient_info.get('screen_hours', 0)
-        outdoor_hrs = patient_info.get('outdoor_hours', 0)
         if screen_hrs > 4:
             analysis_items.append(f"<b>Lifestyle Risk:</b> High screen time ({screen_hrs} hours/day) increases progression risk. Reduction recommended.")
         if outdoor_hrs < 2:
@@ -275,27 +461,30 @@ class MyopiaReportGenerator:
         if screen_hrs <= 4 and outdoor_hrs >= 2:
             analysis_items.append("<b>Lifestyle Risk:</b> Screen time and outdoor activity levels are within acceptable ranges.")
         
-        for item in analysis_items:
-            story.append(Paragraph(f"• {item}", self.styles['CustomBody']))
-        
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Treatment Effectiveness Summary
-        story.append(Paragraph("Treatment Effectiveness Summary", self.styles['CustomHeading']))
-        stellest_data = prediction_results['stellest_effectiveness']
-        story.append(Paragraph(
-            f"<b>Projected Outcome:</b> With current compliance, Stellest lens is expected to reduce progression by "
-            f"<b>{stellest_data['reduction_percentage']:.1f}%</b>. Without treatment, progression would be "
-            f"<b>{stellest_data['without_stellest']:.2f} D/year</b>, compared to "
-            f"<b>{stellest_data['with_stellest']:.2f} D/year</b> with Stellest.",
-            self.styles['CustomBody']
-        ))
-        
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Monitoring Schedule
-        story.append(Paragraph("Recommended Monitoring Schedule", self.styles['CustomHeading']))
-        
+        return (
+            _static_paragraph("Detailed Clinical Analysis", 'CustomHeading'),
+            Paragraph("<br/><br/>".join(f"• {item}" for item in analysis_items), self.styles['CustomBody']),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _treatment_summary_section(self, report):
+        """Projected outcome with Stellest"""
+        stellest_data = report['prediction_results']['stellest_effectiveness']
+        return (
+            _static_paragraph("Treatment Effectiveness Summary", 'CustomHeading'),
+            Paragraph(
+                f"<b>Projected Outcome:</b> With current compliance, Stellest lens is expected to reduce progression by "
+                f"<b>{stellest_data['reduction_percentage']:.1f}%</b>. Without treatment, progression would be "
+                f"<b>{stellest_data['without_stellest']:.2f} D/year</b>, compared to "
+                f"<b>{stellest_data['with_stellest']:.2f} D/year</b> with Stellest.",
+                self.styles['CustomBody']
+            ),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _monitoring_section(self, report):
+        """Follow-up interval for the risk category"""
+        risk_category = report['prediction_results']['risk_category']
         if risk_category == "High Risk":
             monitoring = "Every 3 months"
         elif risk_category == "Medium Risk":
@@ -303,72 +492,73 @@ class MyopiaReportGenerator:
         else:
             monitoring = "Every 6 months"
         
-        story.append(Paragraph(f"<b>Follow-up Interval:</b> {monitoring}", self.styles['CustomBody']))
-        story.append(Paragraph(
-            "<b>Monitoring Parameters:</b><br/>"
-            "• Refraction (spherical and cylindrical)<br/>"
-            "• Axial length measurement<br/>"
-            "• Visual acuity assessment<br/>"
-            "• Compliance with Stellest wearing schedule<br/>"
-            "• Quality of life assessment",
-            self.styles['CustomBody']
-        ))
-        
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Risk Factor Breakdown
-        if risk_factors:
-            story.append(Paragraph("Risk Factor Breakdown", self.styles['CustomHeading']))
-            story.append(Paragraph(
+        return (
+            _static_paragraph("Recommended Monitoring Schedule", 'CustomHeading'),
+            _static_paragraph(f"<b>Follow-up Interval:</b> {monitoring}", 'CustomBody'),
+            _static_paragraph(_MONITORING_HTML, 'CustomBody'),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _risk_breakdown_section(self, report):
+        """Scored contributing factors, when the caller supplies them"""
+        risk_factors = report['risk_factors']
+        if not (risk_factors and isinstance(risk_factors, dict)):
+            return ()
+        
+        contributing_factors = "<br/><br/>".join([
+            "<b>Contributing Factors:</b>",
+            *(
+                f"• <b>{factor['factor']}</b> ({factor['impact']} Impact, Score: {factor['score']:.1f}): {factor['description']}"
+                for factor in risk_factors['factors']
+            ),
+        ])
+        
+        return (
+            _static_paragraph("Risk Factor Breakdown", 'CustomHeading'),
+            Paragraph(
                 f"<b>Overall Risk Score:</b> {risk_factors['total_score']:.1f} / {risk_factors['max_possible_score']} "
                 f"({risk_factors['risk_percentage']:.0f}% of maximum risk)",
                 self.styles['CustomBody']
-            ))
-            
-            story.append(Paragraph("<b>Contributing Factors:</b>", self.styles['CustomBody']))
-            for factor in risk_factors['factors']:
-                impact_color = '#C73E1D' if factor['impact'] == 'High' else '#F18F01' if factor['impact'] == 'Medium' else '#06A77D'
-                story.append(Paragraph(
-                    f"• <b>{factor['factor']}</b> ({factor['impact']} Impact, Score: {factor['score']:.1f}): {factor['description']}",
-                    self.styles['CustomBody']
-                ))
-            
-            story.append(Spacer(1, 0.3 * inch))
-        
-        # Progression Timeline
-        if progression_timeline:
-            story.append(Paragraph("Long-term Progression Projections", self.styles['CustomHeading']))
-            
-            timeline_data = [['Year', 'Age', 'With Stellest (D)', 'Without Treatment (D)', 'Saved (D)']]
-            for t in progression_timeline:
-                timeline_data.append([
-                    str(t['year']),
-                    f"{t['projected_age']:.1f}",
-                    f"{t['severity_with_treatment']:.2f}",
-                    f"{t['severity_without_treatment']:.2f}",
-                    f"{t['saved_diopters']:.2f}"
-                ])
-            
-            timeline_table = Table(timeline_data, colWidths=[0.8 * inch, 0.8 * inch, 1.5 * inch, 1.5 * inch, 1 * inch])
-            timeline_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-            ]))
-            story.append(timeline_table)
-            story.append(Spacer(1, 0.3 * inch))
-        
-        # Comparative Statistics
-        if comparative_stats:
-            story.append(Paragraph("Population Comparison Analysis", self.styles['CustomHeading']))
-            
-            story.append(Paragraph(
+            ),
+            Paragraph(contributing_factors, self.styles['CustomBody']),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _timeline_section(self, report):
+        """Year-by-year projections, when the caller supplies them"""
+        progression_timeline = report['progression_timeline']
+        if not progression_timeline:
+            return ()
+        
+        timeline_data = [('Year', 'Age', 'With Stellest (D)', 'Without Treatment (D)', 'Saved (D)')]
+        timeline_data.extend(
+            (
+                str(t['year']),
+                f"{t['projected_age']:.1f}",
+                f"{t['severity_with_treatment']:.2f}",
+                f"{t['severity_without_treatment']:.2f}",
+                f"{t['saved_diopters']:.2f}"
+            )
+            for t in progression_timeline
+        )
+        
+        timeline_table = Table(timeline_data, colWidths=[0.8 * inch, 0.8 * inch, 1.5 * inch, 1.5 * inch, 1 * inch])
+        timeline_table.setStyle(_TIMELINE_TABLE_STYLE)
+        return (
+            _static_paragraph("Long-term Progression Projections", 'CustomHeading'),
+            timeline_table,
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _comparison_section(self, report):
+        """Patient against the population average, when the caller supplies it"""
+        comparative_stats = report['comparative_stats']
+        if not comparative_stats:
+            return ()
+        
+        return (
+            _static_paragraph("Population Comparison Analysis", 'CustomHeading'),
+            Paragraph(
                 f"<b>Age Group:</b> {comparative_stats['age_group']} years<br/>"
                 f"<b>Population Average Severity:</b> {comparative_stats['population_avg_severity']} D<br/>"
                 f"<b>Patient Severity:</b> {comparative_stats['patient_severity']:.2f} D<br/>"
@@ -379,43 +569,46 @@ class MyopiaReportGenerator:
                 f"• Patient: {comparative_stats['patient_axial_length']:.2f} mm<br/>"
                 f"• Difference: {comparative_stats['axial_length_difference']:+.2f} mm",
                 self.styles['CustomBody']
-            ))
-            
-            story.append(Spacer(1, 0.3 * inch))
-        
-        story.append(Spacer(1, 0.3 * inch))
-        
-        # Footer disclaimer
-        story.append(Paragraph(
-            "<i>This report is generated by Stellest AI using machine learning algorithms trained on clinical data. "
-            "It should be used as a clinical decision support tool and not as a replacement for professional medical judgment. "
-            "Please consult with an eye care professional for comprehensive assessment and treatment planning.</i>",
-            self.styles['Normal']
-        ))
-        
-        # Build PDF
-        doc.build(story)
-        return output_path
+            ),
+            Spacer(1, 0.3 * inch),
+        )
+    
+    def _disclaimer_section(self, report):
+        """Footer disclaimer"""
+        return (
+            Spacer(1, 0.3 * inch),
+            _static_paragraph(_DISCLAIMER_HTML, 'Normal'),
+        )
+    
+    # Report layout, top to bottom; each section returns its flowables, or nothing to be left out
+    _SECTIONS = (
+        _header_section,
+        _patient_section,
+        _clinical_section,
+        _risk_assessment_section,
+        _effectiveness_section,
+        _risk_factor_section,
+        _recommendations_section,
+        _analysis_section,
+        _treatment_summary_section,
+        _monitoring_section,
+        _risk_breakdown_section,
+        _timeline_section,
+        _comparison_section,
+        _disclaimer_section,
+    )
     
     def _get_risk_color(self, risk_category):
         """Get color code for risk category"""
-        color_map = {
-            'Low Risk': '#06A77D',
-            'Medium Risk': '#F18F01',
-            'High Risk': '#C73E1D'
-        }
-        return color_map.get(risk_category, '#000000')
+        return _RISK_COLORS.get(risk_category, '#000000')
     
     def _generate_recommendations(self, patient_info, prediction_results):
         """Generate personalized recommendations"""
-        recommendations = []
+        recommendations = list(_REC_FIRST)
         
         risk_category = prediction_results['risk_category']
-        
-        # General recommendations
-        recommendations.append(
-            "Continue wearing Stellest lenses for at least 12 hours daily to achieve optimal myopia control effect."
-        )
+        screen_hrs = patient_info.get('screen_hours', 0)
+        outdoor_hrs = patient_info.get('outdoor_hours', 0)
         
         # Risk-specific recommendations
         if risk_category == "High Risk":
@@ -428,15 +621,15 @@ class MyopiaReportGenerator:
             )
         
         # Environmental recommendations
-        if patient_info.get('screen_hours', 0) > 3:
+        if screen_hrs > 3:
             recommendations.append(
-                f"Reduce screen time from current {patient_info.get('screen_hours')} hours/day to less than 2 hours. "
+                f"Reduce screen time from current {screen_hrs} hours/day to less than 2 hours. "
                 "Follow the 20-20-20 rule: every 20 minutes, look at something 20 feet away for 20 seconds."
             )
         
-        if patient_info.get('outdoor_hours', 0) < 2:
+        if outdoor_hrs < 2:
             recommendations.append(
-                f"Increase outdoor time from current {patient_info.get('outdoor_hours')} hours/day to at least 2 hours daily. "
+                f"Increase outdoor time from current {outdoor_hrs} hours/day to at least 2 hours daily. "
                 "Outdoor activity has been shown to have protective effects against myopia progression."
             )
         
@@ -452,17 +645,15 @@ class MyopiaReportGenerator:
                 "Axial length is above normal range. Regular monitoring is essential to track any further elongation."
             )
         
-        recommendations.append(
-            "Maintain good reading distance (at least 30cm from eyes) and ensure adequate lighting during near work."
-        )
-        
-        recommendations.append(
-            "Consider nutritional support with foods rich in Omega-3 fatty acids and antioxidants for overall eye health."
-        )
-        
+        recommendations.extend(_REC_LAST)
         return recommendations
 
 
+def _generate_one(generator_class, cache_dir, job):
+    """Worker entry point for generate_reports_batch; output_path must be a file path"""
+    return generator_class(cache_dir=cache_dir).generate_report(**job)
+
+
 if __name__ == "__main__":
     # Test report generation
     generator = MyopiaReportGenerator()